@@ -2,14 +2,14 @@ import os
 from datetime import datetime, timedelta
 from pathlib import Path
 
-import yaml
 from dotenv import load_dotenv
 
 from hll_stats_tools.data_acquisition.talk_to_server import download_sequential_logs
 from hll_stats_tools.utils.common_utils import openfile
+from hll_stats_tools.utils.config import load_config
 from hll_stats_tools.utils.logger_utils import setup_logger
 
-cfg = yaml.safe_load(Path("config.yaml").read_text())
+cfg = load_config()
 
 update_to_last_minute = cfg["update_to_last_minute"]
 load_dotenv(".env")
@@ -64,7 +64,7 @@ def game_analysis(game: dict, file_stem: str) -> dict:
 
     return {
         "start date": start_date,
-        "date": start_date.split("T")[0],
+        "date": start_date.partition("T")[0],
         "map": map,
         "game time": game_time,
         "seeding match": seeded,
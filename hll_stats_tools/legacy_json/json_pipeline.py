@@ -3,9 +3,9 @@ import os
 from datetime import date
 from pathlib import Path
 
-import yaml
 from dotenv import load_dotenv
 
+from hll_stats_tools.utils.config import load_config
 from hll_stats_tools.utils.logger_utils import setup_logger
 
 from .runner import (
@@ -21,7 +21,7 @@ logger = setup_logger(__name__)
 
 def run_json_pipeline():
     # load config.yaml
-    cfg = yaml.safe_load(Path("config.yaml").read_text())
+    cfg = load_config()
 
     # pull flags
     split_logs_to_games = cfg["split_logs_to_games"]
@@ -1,13 +1,20 @@
+import functools
+import heapq
 import json
 import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from operator import itemgetter
 from pathlib import Path
 
 from dateutil import parser as dateutil_parser
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, false, func, text
+from sqlalchemy import create_engine, event, false, func, insert, select
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from hll_stats_tools.sql_pipeline.models import (
     Base,
@@ -20,20 +27,32 @@ from hll_stats_tools.sql_pipeline.models import (
     ProcessedFile,
     game_players,
 )
-from hll_stats_tools.sql_pipeline.sql_utils import calc_player_stats
+from hll_stats_tools.sql_pipeline.sql_utils import calc_all_player_stats
+from hll_stats_tools.utils.common_utils import loads
 from hll_stats_tools.utils.logger_utils import setup_logger
 
 logger = setup_logger(__name__)
 
 
-# SQLite variable limit and batch size
-SQLITE_MAX_VARS = 999
+# SQLite variable limit (raised from 999 to 32766 in 3.32.0) and batch size
+SQLITE_MAX_VARS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+# keep any single multi-row INSERT bounded, however narrow the table
+MAX_ROWS_PER_STMT = 5000
 BATCH_SIZE = 50
 
+# score in MATCH ENDED content, e.g. "... ALLIED (5 - 3) AXIS"
+_SCORE_RE = re.compile(r"\((\d+)\s*-\s*(\d+)\)")
 
+
+# many events in a log share the same second, so timestamp strings repeat
+@functools.lru_cache(maxsize=4096)
 def parse_datetime(s: str) -> datetime:
-    # robustly handle ISO and other formats
-    return dateutil_parser.isoparse(s)
+    try:
+        # C-level fast path for the ISO strings the API sends
+        return datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        # robustly handle any other ISO variants
+        return dateutil_parser.isoparse(s)
 
 
 def now_utc() -> datetime:
@@ -41,11 +60,26 @@ def now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def update_player(session, ev, id_key, name_key):
+def rows_per_statement(cols):
+    """How many rows of `cols` bound values fit in one SQLite statement."""
+    return max(1, min(MAX_ROWS_PER_STMT, SQLITE_MAX_VARS // cols))
+
+
+def chunked(rows, size):
+    """Yield successive slices of `rows` holding at most `size` items."""
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def update_player(players_seen, ev, id_key, name_key, now):
     """
-    Upsert the Player record for ev[id_key], tracking name changes.
+    Record ev[id_key] in `players_seen` for the batch upsert, tracking name changes.
     id_key is 'player1_id' or 'player2_id'
     name_key is 'player1_name' or 'player2_name'
+    now is the (aware UTC) time the event is being processed
+
+    players_seen maps pid -> {"names": [(name, seen_at), ...], "last_seen": ts},
+    where consecutive duplicate names are collapsed.
     """
     pid = ev.get(id_key)
     pname = ev.get(name_key) or "<unknown>"
@@ -54,48 +88,98 @@ def update_player(session, ev, id_key, name_key):
     if not pid:
         return
 
-    # Try to load existing player
-    p = session.get(Player, pid)
+    seen = players_seen.get(pid)
+    if seen is None:
+        players_seen[pid] = {"names": [(pname, now)], "last_seen": now}
+        return
+    if seen["names"][-1][0] != pname:
+        seen["names"].append((pname, now))
+    seen["last_seen"] = now
 
-    # 1) New player
-    if p is None:
-        p = Player(
-            player_id=pid,
-            current_name=pname,
-            first_seen=datetime.now(),
-            last_seen=datetime.now(),
-        )
-        session.add(p)
-        session.flush()  # push so p exists in DB
-
-        # Record the very first name
-        session.add(
-            PlayerName(
-                player_id=pid,
-                name=pname,
-                changed_at=datetime.now(),
-            )
+
+def load_known_players(session):
+    """Map every stored player_id to its current_name, read once per run."""
+    return dict(session.execute(select(Player.player_id, Player.current_name)).all())
+
+
+def flush_players(session, players_seen, known_players):
+    """
+    Write the batch's Player upserts and PlayerName alias rows in bulk.
+
+    Each player's sequence of names is replayed against `known_players`
+    (pid -> current_name) so every alias change gets a PlayerName row,
+    exactly as the per-event ORM version did. `known_players` is updated
+    in place with the new current names.
+    """
+    if not players_seen:
+        return
+
+    player_rows = []
+    name_rows = []
+    for pid, seen in players_seen.items():
+        current = known_players.get(pid)
+        for pname, seen_at in seen["names"]:
+            # New player or alias change: log the name
+            if pname != current:
+                name_rows.append(
+                    {"player_id": pid, "name": pname, "changed_at": seen_at}
+                )
+                current = pname
+        known_players[pid] = current
+        player_rows.append(
+            {
+                "player_id": pid,
+                "current_name": current,
+                "first_seen": seen["names"][0][1],
+                "last_seen": seen["last_seen"],
+            }
         )
 
-    # 2) Name change
-    elif p.current_name != pname:
-        p.current_name = pname
-        p.last_seen = datetime.now()
-        session.add(p)
-
-        # Log the alias change
-        session.add(
-            PlayerName(
-                player_id=pid,
-                name=pname,
-                changed_at=datetime.now(),
-            )
+    # first_seen is only written for new players; existing rows keep theirs
+    for chunk in chunked(player_rows, rows_per_statement(4)):
+        stmt = sqlite_insert(Player).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["player_id"],
+            set_={
+                "current_name": stmt.excluded.current_name,
+                "last_seen": stmt.excluded.last_seen,
+            },
         )
+        session.execute(stmt)
 
-    # 3) Existing player, same name—just update last_seen
-    else:
-        p.last_seen = datetime.now()
-        session.add(p)
+    if name_rows:
+        session.execute(insert(PlayerName), name_rows)
+
+
+def player_analysis_mapping(stats: dict, player_id: str) -> dict:
+    """
+    Build the PlayerAnalysis column mapping for one player's computed stats.
+
+    Parameters:
+    - stats: dictionary of player statistics (output of calc_player_stats)
+    - player_id: ID of the player the stats belong to
+
+    Returns:
+    - A dict of PlayerAnalysis column values (without analysis_id)
+    """
+    return {
+        "player_id": player_id,
+        "tot_kills": stats["tot_kills"],
+        "tot_deaths": stats["tot_deaths"],
+        "tot_team_kills": stats["tot_team_kills"],
+        "tot_team_deaths": stats["tot_team_deaths"],
+        "kpm": stats["kpm"],
+        "dpm": stats["dpm"],
+        "ratio": stats["ratio"],
+        "time_played_secs": stats.get("time_played_seconds", 0),
+        # Store distributions as JSON-encoded strings
+        "kill_distribution": json.dumps(stats["kill_distribution"]),
+        "death_distribution": json.dumps(stats["death_distribution"]),
+        "team_kill_distribution": json.dumps(stats["team_kill_distribution"]),
+        "team_death_distribution": json.dumps(stats["team_death_distribution"]),
+        "weapons_kill_distribution": json.dumps(stats["weapons_kills"]),
+        "weapons_death_distribution": json.dumps(stats["weapons_deaths"]),
+    }
 
 
 def create_player_analysis(
@@ -118,24 +202,7 @@ def create_player_analysis(
     - The newly created PlayerAnalysis instance (not yet committed)
     """
     # Instantiate a new PlayerAnalysis object with scalar fields
-    new_analysis = PlayerAnalysis(
-        player_id=player.player_id,
-        tot_kills=stats["tot_kills"],
-        tot_deaths=stats["tot_deaths"],
-        tot_team_kills=stats["tot_team_kills"],
-        tot_team_deaths=stats["tot_team_deaths"],
-        kpm=stats["kpm"],
-        dpm=stats["dpm"],
-        ratio=stats["ratio"],
-        time_played_secs=stats.get("time_played_seconds", 0),
-        # Store distributions as JSON-encoded strings
-        kill_distribution=json.dumps(stats["kill_distribution"]),
-        death_distribution=json.dumps(stats["death_distribution"]),
-        team_kill_distribution=json.dumps(stats["team_kill_distribution"]),
-        team_death_distribution=json.dumps(stats["team_death_distribution"]),
-        weapons_kill_distribution=json.dumps(stats["weapons_kills"]),
-        weapons_death_distribution=json.dumps(stats["weapons_deaths"]),
-    )
+    new_analysis = PlayerAnalysis(**player_analysis_mapping(stats, player.player_id))
 
     # Add to session and flush to assign an ID
     if not test:
@@ -153,6 +220,11 @@ def create_analysis(
      2. Compute per-player stats and persist them
      3. Create a GameAnalysis record linking all PlayerAnalysis entries
 
+    Stats for all players are computed together from a single scan of the
+    game's events. PlayerAnalysis rows are written with a single bulk INSERT
+    rather than one ORM instance per player; in test mode they are attached
+    to the returned GameAnalysis as unsaved instances instead.
+
     Parameters:
     - session: active SQLAlchemy session
     - game: Game instance to analyze
@@ -168,30 +240,87 @@ def create_analysis(
     if not game.ended:
         return None
 
-    # Compute and persist stats for each player in the game
-    player_stats_objs = []
+    # Compute stats for every player in the game in one pass over its events
+    player_ids = [player.player_id for player in game.players]
+    all_stats = calc_all_player_stats(session, game, player_ids)
+    player_rows = []
     for player in game.players:
-        stats = calc_player_stats(game, player.player_id)
+        stats = all_stats[player.player_id]
         if stats is None:
             # skip players with invalid stats
             continue
-        pa = create_player_analysis(session, stats, game, player, test=test)
-        player_stats_objs.append(pa)
+        player_rows.append(player_analysis_mapping(stats, player.player_id))
 
-    # Create the GameAnalysis row, linking to game and player analyses
-    db_analysis = GameAnalysis(
-        game_key=game.game_key, game=game, player_stats=player_stats_objs
-    )
+    if test:
+        return GameAnalysis(
+            game_key=game.game_key,
+            game=game,
+            player_stats=[PlayerAnalysis(**row) for row in player_rows],
+        )
 
-    # Add, flush, and return
-    if not test:
-        session.add(db_analysis)
-        session.flush()
+    # Create the GameAnalysis row; flush so its id can be referenced below
+    db_analysis = GameAnalysis(game_key=game.game_key, game=game)
+    session.add(db_analysis)
+    session.flush()
+
+    # Bulk-insert all PlayerAnalysis rows in one executemany
+    if player_rows:
+        for row in player_rows:
+            row["analysis_id"] = db_analysis.id
+        session.execute(insert(PlayerAnalysis), player_rows)
     return db_analysis
 
 
-def is_processed(fname, session):
-    return session.get(ProcessedFile, fname) is not None
+# Game columns ingest keeps in memory for open games (one plain dict per
+# game), and the subset a seeding notice or MATCH ENDED can change later
+GAME_COLUMNS = (
+    "game_key",
+    "server",
+    "game_number",
+    "seeding",
+    "start_time",
+    "end_time",
+    "ended",
+    "map",
+    "mode",
+    "duration",
+    "allied_score",
+    "axis_score",
+    "winner",
+)
+GAME_UPDATE_COLUMNS = (
+    "seeding",
+    "end_time",
+    "ended",
+    "duration",
+    "allied_score",
+    "axis_score",
+    "winner",
+)
+
+
+def load_active_games(session):
+    """Map each server to its open (not ended) game, as a GAME_COLUMNS dict."""
+    stmt = select(*(Game.__table__.c[col] for col in GAME_COLUMNS)).where(
+        Game.ended == false()
+    )
+    return {row.server: dict(row._mapping) for row in session.execute(stmt)}
+
+
+def flush_games(session, touched_games):
+    """
+    Write the batch's new and changed Games (game_key -> GAME_COLUMNS dict)
+    with one multi-row upsert per chunk. Existing rows only get the
+    GAME_UPDATE_COLUMNS rewritten.
+    """
+    rows = list(touched_games.values())
+    for chunk in chunked(rows, rows_per_statement(len(GAME_COLUMNS))):
+        stmt = sqlite_insert(Game).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["game_key"],
+            set_={col: stmt.excluded[col] for col in GAME_UPDATE_COLUMNS},
+        )
+        session.execute(stmt)
 
 
 def parse_match_start(ev, ev_time, srv, last_nums):
@@ -202,87 +331,149 @@ def parse_match_start(ev, ev_time, srv, last_nums):
     prefix = "MATCH START "
     if raw.startswith(prefix):
         after = raw[len(prefix) :]
-        try:
-            game_map, game_mode = after.rsplit(" ", 1)
-        except ValueError:
+        game_map, sep, game_mode = after.rpartition(" ")
+        if not sep:
             game_map, game_mode = after, None
     else:
         game_map = game_mode = None
-    return Game(
-        game_key=key,
-        server=srv,
-        game_number=n,
-        start_time=ev_time,
-        map=game_map,
-        mode=game_mode,
-    )
+    return {
+        "game_key": key,
+        "server": srv,
+        "game_number": n,
+        "seeding": False,
+        "start_time": ev_time,
+        "end_time": None,
+        "ended": False,
+        "map": game_map,
+        "mode": game_mode,
+        "duration": None,
+        "allied_score": None,
+        "axis_score": None,
+        "winner": None,
+    }
 
 
 def close_match(ev, game, ev_time):
-    game.end_time = ev_time
-    game.ended = True
-    game.duration = int((game.end_time - game.start_time).total_seconds())
-    tokens = ev["content"].split("(")[1][:5].split(" - ")
-    game.allied_score = int(tokens[0])
-    game.axis_score = int(tokens[1])
-    game.winner = "allies" if game.allied_score > game.axis_score else "axis"
+    game["end_time"] = ev_time
+    game["ended"] = True
+    game["duration"] = int((ev_time - game["start_time"]).total_seconds())
+    score = _SCORE_RE.search(ev["content"])
+    game["allied_score"] = int(score[1])
+    game["axis_score"] = int(score[2])
+    game["winner"] = "allies" if game["allied_score"] > game["axis_score"] else "axis"
+
+
+@functools.lru_cache(maxsize=4096)
+def sqlite_datetime(dt: datetime) -> str:
+    # same text layout SQLAlchemy's SQLite DateTime type stores and parses
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+# Event columns written by the raw insert, in the order build_event_record
+# lays out each row tuple
+EVENT_COLUMNS = (
+    "event_id",
+    "creation_time",
+    "event_time",
+    "type",
+    "player1_name",
+    "player1_id",
+    "player2_name",
+    "player2_id",
+    "raw",
+    "content",
+    "server",
+    "weapon",
+    "game_key",
+    "inserted_at",
+)
 
 
-def build_event_record(ev, ev_time, active_games):
+def build_event_record(ev, ev_time, active_games, inserted_at):
+    """
+    Build one Event row tuple (ordered as EVENT_COLUMNS) for the raw
+    executemany insert. Datetimes are pre-formatted so no type adaptation
+    happens at bind time.
+    """
     srv = ev.get("server")
-    return {
-        "event_id": ev["id"],
-        "creation_time": parse_datetime(ev["creation_time"]),
-        "event_time": ev_time,
-        "type": ev["type"],
-        "player1_name": ev.get("player1_name"),
-        "player1_id": ev.get("player1_id"),
-        "player2_name": ev.get("player2_name"),
-        "player2_id": ev.get("player2_id"),
-        "raw": ev.get("raw"),
-        "content": ev.get("content"),
-        "server": srv,
-        "weapon": ev.get("weapon"),
-        "game_key": (
-            active_games[srv].game_key if srv in active_games else None
-        ),
-    }
+    return (
+        ev["id"],
+        sqlite_datetime(ev["_ct"]),
+        sqlite_datetime(ev_time),
+        ev["type"],
+        ev.get("player1_name"),
+        ev.get("player1_id"),
+        ev.get("player2_name"),
+        ev.get("player2_id"),
+        ev.get("raw"),
+        ev.get("content"),
+        srv,
+        ev.get("weapon"),
+        active_games[srv]["game_key"] if srv in active_games else None,
+        inserted_at,
+    )
 
 
-def process_event_file(data, session, last_nums, active_games):
+def parse_file(path):
     """
-    Processes one JSON file’s events. Returns:
-      • records: a list of dicts (each dict → one Event row to be inserted),
+    Read and decode one log file, returning (filename, events sorted by
+    event_time). Pure and picklable, so it can run in a worker process.
+
+    Each event's timestamps are parsed once here and kept on the dict as
+    "_et" (event_time) and "_ct" (creation_time) for the rest of ingest.
+    """
+    with open(path, "rb") as f:
+        data = loads(f.read())
+    for ev in data:
+        ev["_et"] = parse_datetime(ev["event_time"])
+        ev["_ct"] = parse_datetime(ev["creation_time"])
+    data.sort(key=lambda r: r["_et"])
+    return path.name, data
+
+
+def process_events(
+    events, last_nums, active_games, touched_games, players_seen, game_player_pairs
+):
+    """
+    Processes a stream of events in event_time order, recording created or
+    changed games into `touched_games`, players into `players_seen` and
+    (game_key, player_id) links into `game_player_pairs`.
+    Returns:
+      • records: a list of tuples (each tuple → one Event row to be inserted),
       • ended_keys: a set of game_key strings where we saw 'MATCH ENDED'.
     """
     records = []
     event_keys = set()
+    # one local timestamp for every audit column this batch writes, matching
+    # the datetime.now defaults in models.py
+    now = datetime.now()
+    inserted_at = sqlite_datetime(now)
 
-    for ev in sorted(data, key=lambda r: r["event_time"]):
-        update_player(session, ev, "player1_id", "player1_name")
-        update_player(session, ev, "player2_id", "player2_name")
+    for ev in events:
+        update_player(players_seen, ev, "player1_id", "player1_name", now)
+        update_player(players_seen, ev, "player2_id", "player2_name", now)
 
-        ev_time = parse_datetime(ev["event_time"])
+        ev_time = ev["_et"]
         ev_type = ev["type"]
         srv = ev.get("server")
 
         if srv in active_games and "THANK YOU FOR SEEDING" in (
             ev.get("content") or ""
         ):
-            active_games[srv].seeding = True
-            session.add(active_games[srv])
+            game = active_games[srv]
+            game["seeding"] = True
+            touched_games[game["game_key"]] = game
 
         if ev_type == "MATCH START":
             game = parse_match_start(ev, ev_time, srv, last_nums)
-            session.add(game)
-            session.flush()
+            touched_games[game["game_key"]] = game
             active_games[srv] = game
 
         elif ev_type == "MATCH ENDED" and srv in active_games:
             game = active_games[srv]
             close_match(ev, game, ev_time)
-            event_keys.add(game.game_key)
-            session.add(game)
+            event_keys.add(game["game_key"])
+            touched_games[game["game_key"]] = game
             # analysis = create_analysis(session, game)
             # if analysis:
             #     session.add(analysis)
@@ -294,61 +485,97 @@ def process_event_file(data, session, last_nums, active_games):
             #         game.seeding,
             #     )
 
-        records.append(build_event_record(ev, ev_time, active_games))
+        records.append(build_event_record(ev, ev_time, active_games, inserted_at))
 
         if srv in active_games:
-            gk = active_games[srv].game_key
+            gk = active_games[srv]["game_key"]
             for pid in (ev.get("player1_id"), ev.get("player2_id")):
                 if pid:
-                    stmt = (
-                        sqlite_insert(game_players)
-                        .values(game_key=gk, player_id=pid)
-                        .prefix_with("OR IGNORE")
-                    )
-                    session.execute(stmt)
+                    game_player_pairs.add((gk, pid))
 
     return records, event_keys
 
 
 def ingest_batch(
-    file_paths, session, last_nums, active_games, verbose=False
+    file_paths,
+    session,
+    last_nums,
+    active_games,
+    processed,
+    known_players,
+    verbose=False,
+    executor=None,
 ):  # noqa: C901
-    mappings = []
-    to_mark = []
-    ended_games_in_batch = set()
+    """
+    Ingest one batch of log files. `processed` is the set of filenames
+    already ingested; newly ingested files are added to it.
+    `known_players` maps player_id -> current_name and is kept up to date.
+    Files are decoded through `executor` when given (e.g. a process pool);
+    everything that touches the session stays in this process, and sees the
+    batch's events merged into one event_time order.
+    """
+    touched_games = {}
+    players_seen = {}
+    game_player_pairs = set()
 
+    to_parse = []
     for path in file_paths:
-        fname = path.name
-        if is_processed(fname, session):
-            logger.info("Skipping already-processed file: %s", fname)
-            continue
+        if path.name in processed:
+            logger.info("Skipping already-processed file: %s", path.name)
+        else:
+            to_parse.append(path)
 
-        with open(path, encoding="utf-8") as f:
-            data = json.load(f)
+    if executor is not None and len(to_parse) > 1:
+        parsed = executor.map(parse_file, to_parse, chunksize=4)
+    else:
+        parsed = map(parse_file, to_parse)
 
-        records, event_keys = process_event_file(
-            data, session, last_nums, active_games
-        )
-        mappings.extend(records)
-        ended_games_in_batch.update(event_keys)
-        to_mark.append(fname)
+    files = list(parsed)
+    to_mark = [fname for fname, _ in files]
+
+    # Each file is already sorted; files may overlap in time, so merge them
+    events = heapq.merge(*(data for _, data in files), key=itemgetter("_et"))
+    mappings, ended_games_in_batch = process_events(
+        events, last_nums, active_games, touched_games, players_seen, game_player_pairs
+    )
 
     if not mappings:
-        return
-    # --- Bulk‐insert all new Event rows into the events table at once ---
-    cols = len(mappings[0])
-    max_rows = max(1, SQLITE_MAX_VARS // cols)
-    for i in range(0, len(mappings), max_rows):
-        chunk = mappings[i : i + max_rows]
-        stmt = sqlite_insert(Event.__table__).values(chunk)
-        stmt = stmt.on_conflict_do_nothing(index_elements=["event_id"])
-        session.execute(stmt)
+        return ended_games_in_batch
+
+    # --- Take the write lock up front: every write below, through the final
+    # session.commit(), runs in this one BEGIN IMMEDIATE transaction ---
+    raw = session.connection().connection
+    if not raw.in_transaction:
+        raw.execute("BEGIN IMMEDIATE")
+
+    # --- Upsert the batch's new, seeded and closed Games in bulk ---
+    flush_games(session, touched_games)
+
+    # --- One bulk upsert for every player seen in the batch ---
+    flush_players(session, players_seen, known_players)
+
+    # --- Link players to games with one INSERT OR IGNORE per chunk ---
+    pair_rows = [{"game_key": gk, "player_id": pid} for gk, pid in game_player_pairs]
+    for chunk in chunked(pair_rows, rows_per_statement(2)):
+        session.execute(
+            sqlite_insert(game_players).values(chunk).prefix_with("OR IGNORE")
+        )
+
+    # --- Bulk‐insert all new Event rows with one raw DBAPI executemany ---
+    sql = (
+        f"INSERT OR IGNORE INTO {Event.__tablename__} ({', '.join(EVENT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+    )
+    cursor = raw.cursor()
+    cursor.executemany(sql, mappings)
+    cursor.close()
 
     for fname in to_mark:
         session.add(ProcessedFile(filename=fname))
         if verbose:
             logger.info("Marked as processed: %s", fname)
     session.commit()
+    processed.update(to_mark)
     logger.info(
         "Game creation. Batch ingested: %d files, %d events queued.",
         len(to_mark),
@@ -357,6 +584,47 @@ def ingest_batch(
     return ended_games_in_batch
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Connect-event hook: tune each new SQLite connection for bulk ingest.
+    WAL with synchronous=NORMAL stays crash-safe while batching page writes.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute("PRAGMA mmap_size = 268435456")
+    cursor.execute("PRAGMA cache_size = -262144")
+    cursor.close()
+
+
+def analyse_ended_games(SessionLocal, ended_keys):
+    """Create analyses for the games that ended in a batch, in a fresh session."""
+    analysis_session = SessionLocal()
+    for gk in ended_keys:
+        game = analysis_session.query(Game).filter_by(game_key=gk).one()
+
+        # Skip if analysis already exists (idempotency)
+        if not game.analyses:
+            analysis = create_analysis(analysis_session, game)
+            if analysis:
+                analysis_session.add(analysis)
+    analysis_session.commit()
+    analysis_session.close()
+
+
+def deferred_event_indexes():
+    """
+    Event indexes to drop during a bulk load and rebuild once afterwards.
+    The game_key index stays: per-batch analyses load events by game.
+    """
+    return [
+        index
+        for index in Event.__table__.indexes
+        if [c.name for c in index.columns] != ["game_key"]
+    ]
+
+
 def run_sql_pipeline():
 
     # Load env vars
@@ -367,6 +635,7 @@ def run_sql_pipeline():
 
     # 0) Load env & decide if we’re resetting
     force = os.getenv("FORCE_RESET", "").lower() in ("1", "true", "yes")
+    bulk = os.getenv("BULK_LOAD", "").lower() in ("1", "true", "yes")
     logger.info(">>> FORCE_RESET = %r, using database %r", force, sql_database)
     if force:
         logger.warning(
@@ -377,21 +646,33 @@ def run_sql_pipeline():
             logger.info("Aborting.")
             return
 
-    # 1) Create engine
-    engine = create_engine(sql_database, echo=False)
+    # 1) Create engine; pooled connections are reused across batch commits
+    engine = create_engine(sql_database, echo=False, poolclass=QueuePool)
 
-    # 2) Set SQLite pragmas
-    with engine.begin() as conn:
-        conn.execute(text("PRAGMA journal_mode = OFF"))
-        conn.execute(text("PRAGMA synchronous = OFF"))
-        conn.execute(text("PRAGMA temp_store = MEMORY"))
+    # 2) Set SQLite pragmas once per new connection
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
-        # Optional drop‐and‐recreate schema
-        if force:
-            logger.info("Dropping all tables and indexes…")
-            Base.metadata.drop_all(engine)
-        logger.info("Creating tables and indexes…")
-        Base.metadata.create_all(engine)
+    # Optional drop‐and‐recreate schema
+    if force:
+        logger.info("Dropping all tables and indexes…")
+        Base.metadata.drop_all(engine)
+    logger.info("Creating tables and indexes…")
+    Base.metadata.create_all(engine)
+
+    # 3) create_all skips existing tables, so restore any event index a killed
+    #    bulk load left dropped; a no-op when they are all present
+    with engine.begin() as conn:
+        for index in deferred_event_indexes():
+            index.create(conn, checkfirst=True)
+
+    # For bulk loads into an existing schema, defer event index maintenance
+    # until the end; a fresh FORCE_RESET schema has an empty events table
+    deferred = deferred_event_indexes() if bulk and not force else []
+    if deferred:
+        logger.info("Dropping %d event indexes for bulk load…", len(deferred))
+        with engine.begin() as conn:
+            for index in deferred:
+                index.drop(conn, checkfirst=True)
 
     # 4) Prepare a single session for all batches
     SessionLocal = sessionmaker(bind=engine, autoflush=False)
@@ -403,40 +684,46 @@ def run_sql_pipeline():
         .group_by(Game.server)
         .all()
     )
-    active_games = {
-        g.server: g
-        for g in ingest_session.query(Game).filter(Game.ended == false()).all()
-    }
+    active_games = load_active_games(ingest_session)
+    processed = set(ingest_session.scalars(select(ProcessedFile.filename)).all())
+    known_players = load_known_players(ingest_session)
+    workers = int(os.getenv("INGEST_WORKERS") or 1)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
     logger.info("Start ingest")
-    # 5) Batch‐process your JSON files
-    all_files = sorted(log_folder.glob("*.json"))
-    for idx in range(0, len(all_files), BATCH_SIZE):
-        batch = all_files[idx : idx + BATCH_SIZE]
-
-        ended_keys = ingest_batch(
-            batch, ingest_session, last_nums, active_games, verbose=True
-        )
-        # ingest_session.commit()
-        analysis_session = SessionLocal()
-        for gk in ended_keys:
-            game = analysis_session.query(Game).filter_by(game_key=gk).one()
-
-            # Skip if analysis already exists (idempotency)
-            if not game.analyses:
-                analysis = create_analysis(analysis_session, game)
-                if analysis:
-                    analysis_session.add(analysis)
-        analysis_session.commit()
-        analysis_session.close()
-
-        logger.info(
-            "Committed batch %d of %d",
-            idx // BATCH_SIZE + 1,
-            ((len(all_files) - 1) // BATCH_SIZE) + 1,
-        )
+    try:
+        # 5) Batch‐process your JSON files
+        all_files = sorted(log_folder.glob("*.json"))
+        for idx in range(0, len(all_files), BATCH_SIZE):
+            batch = all_files[idx : idx + BATCH_SIZE]
+
+            ended_keys = ingest_batch(
+                batch,
+                ingest_session,
+                last_nums,
+                active_games,
+                processed,
+                known_players,
+                verbose=True,
+                executor=executor,
+            )
+            # ingest_session.commit()
+            analyse_ended_games(SessionLocal, ended_keys)
 
-    # 6) Tear down
-    ingest_session.close()
+            logger.info(
+                "Committed batch %d of %d",
+                idx // BATCH_SIZE + 1,
+                ((len(all_files) - 1) // BATCH_SIZE) + 1,
+            )
+    finally:
+        # 6) Tear down, rebuilding any deferred indexes in one transaction
+        if executor is not None:
+            executor.shutdown()
+        ingest_session.close()
+        if deferred:
+            logger.info("Recreating %d deferred event indexes…", len(deferred))
+            with engine.begin() as conn:
+                for index in deferred:
+                    index.create(conn, checkfirst=True)
     logger.info("All done.")
 
 
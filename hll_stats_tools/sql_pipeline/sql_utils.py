@@ -1,17 +1,21 @@
+import atexit
 import functools
+import itertools
 import os
+import shelve
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from itertools import chain, pairwise
+from pathlib import Path
 from typing import List, Optional
 
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, selectinload, sessionmaker
 from sqlalchemy.sql import ClauseElement
 
 from hll_stats_tools.sql_pipeline.models import (
+    Event,
     Game,
     GameAnalysis,
     Player,
@@ -21,8 +25,6 @@ from hll_stats_tools.utils.logger_utils import setup_logger
 
 logger = setup_logger(__name__)
 
-# from hll_stats_tools.sql_tools.models import Game, Event, Player
-
 
 def batch_operation(
     model,  # SQLAlchemy ORM class, e.g. Game or Event
@@ -89,156 +91,243 @@ def batch_operation(
     return decorator
 
 
-def distributions(game, player_id, total_time):
-    kill_events = [
-        ev
-        for ev in game.events
-        if ev.type == "KILL"
-        and (ev.player1_id == player_id or ev.player2_id == player_id)
-    ]
-    kill_distribution = defaultdict(list)
-    death_distribution = defaultdict(list)
-    weapons_kill_distribution = defaultdict(list)
-    weapons_death_distribution = defaultdict(list)
-    tot_kills = 0
-    tot_deaths = 0
-
-    for ev in kill_events:
-        if ev.player1_id == player_id:
-            offset = (ev.event_time - game.start_time).total_seconds()
-            kill_distribution[offset].append(ev.player2_id)
-            weapons_kill_distribution[offset].append(ev.weapon)
-            tot_kills += 1
-        else:
-            offset = (ev.event_time - game.start_time).total_seconds()
-            death_distribution[offset].append(ev.player1_id)
-            weapons_death_distribution[offset].append(ev.weapon)
-            tot_deaths += 1
-
-    team_kill_distribution = defaultdict(list)  # Counter{}
-    team_death_distribution = defaultdict(list)
-    tot_team_kills = 0
-    tot_team_deaths = 0
-    team_kill_events = [
-        ev
-        for ev in game.events
-        if ev.type == "TEAM KILL"
-        and (ev.player1_id == player_id or ev.player2_id == player_id)
-    ]
-    for ev in team_kill_events:
-        if ev.player1_id == player_id:
-            team_kill_distribution[
-                (ev.event_time - game.start_time).total_seconds()
-            ].append(ev.player2_id)
-            tot_team_kills += 1
-        else:
-            team_death_distribution[
-                (ev.event_time - game.start_time).total_seconds()
-            ].append(ev.player1_id)
-            tot_team_deaths += 1
-    if total_time == 0:
-        kpm = 0
-        dpm = 0
-    else:
-        kpm = tot_kills / (total_time / 60)
-        dpm = tot_deaths / (total_time / 60)
+def empty_player_stats(player_id, total_time):
+    """Stats for a player who has no KILL/TEAM KILL events in the game."""
+    return _stats_from_tally(player_id, total_time, _new_tally())
+
+
+# bump whenever the stats computation changes, so cached entries are redone
+STATS_CACHE_VERSION = 1
 
+_stats_cache = None
+
+
+def _open_stats_cache(path):
+    global _stats_cache
+    if _stats_cache is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        _stats_cache = shelve.open(path)
+        atexit.register(_stats_cache.close)
+    return _stats_cache
+
+
+def _get_stats_cache():
+    # .env is already loaded by setup_logger at import
+    path = os.getenv("player_stats_cache")
+    return _open_stats_cache(path) if path else None
+
+
+def _events_version(game, event_times):
+    # cheap fingerprint of the stats inputs: the game's timing (corrected games
+    # change it) and its events' count and latest event time
+    event_times = list(event_times)
     return (
-        kill_distribution,
-        death_distribution,
-        team_kill_distribution,
-        team_death_distribution,
-        weapons_kill_distribution,
-        weapons_death_distribution,
-        tot_kills,
-        tot_deaths,
-        tot_team_kills,
-        tot_team_deaths,
-        kpm,
-        dpm,
+        STATS_CACHE_VERSION,
+        game.start_time,
+        game.end_time,
+        game.duration,
+        len(event_times),
+        max(event_times, default=None),
     )
 
 
-def calc_player_stats(game, player_id):
+def connected_seconds(game, player_id, times):
+    """
+    Seconds from a player's first CONNECTED to their last DISCONNECTED event,
+    given (event_time, type) pairs; gaps while disconnected are included. A
+    missing first connect or last disconnect is filled in from the game's
+    start (+5 min) or end. Returns None if the sequence can't be paired up.
+    """
     actual_start_time = game.start_time + timedelta(minutes=5)
-    timelimits = [
-        ev
+    times = sorted(times, key=lambda x: x[0])
+    if times[0][1] == "DISCONNECTED":
+        new_start = (actual_start_time, "CONNECTED")
+        times.insert(0, new_start)
+    if times[-1][1] == "CONNECTED":
+        new_end = (game.end_time, "DISCONNECTED")
+        times.append(new_end)
+    if len(times) % 2 != 0:
+        entries = ",".join([str(x[1]) for x in times])
+        logger.warning(
+            "Times len is odd in game %s, player %s:\n%s\n%s",
+            game.game_key,
+            player_id,
+            times,
+            entries,
+        )
+        return None
+    return (times[-1][0] - times[0][0]).total_seconds()
+
+
+def calc_player_stats(game, player_id):
+    rows = [
+        (ev.type, ev.player1_id, ev.player2_id, ev.weapon, ev.event_time)
         for ev in game.events
-        if ev.type in ("CONNECTED", "DISCONNECTED") and ev.player1_id == player_id
     ]
-    if len(timelimits) == 0:
-        total_time = game.duration - 300
-    else:
+    return _stats_for_rows(game, rows, [player_id])[player_id]
 
-        times = sorted(
-            ((event.event_time, event.type) for event in timelimits),
-            key=lambda x: x[0],
-        )
-        if times[0][1] == "DISCONNECTED":
-            new_start = (actual_start_time, "CONNECTED")
-            times.insert(0, new_start)
-        if times[-1][1] == "CONNECTED":
-            new_end = (game.end_time, "DISCONNECTED")
-            times.append(new_end)
-        if len(times) % 2 != 0:
-            entries = ",".join([str(x[1]) for x in times])
-            logger.warning(
-                "Times len is odd in game %s, player %s:\n%s\n%s",
-                game.game_key,
-                player_id,
-                times,
-                entries,
-            )
-            return None
-        total_time = 0
-        for start, end in pairwise(times):
-            total_time += (end[0] - start[0]).total_seconds()
-
-    (
-        kill_distribution,
-        death_distribution,
-        team_kill_distribution,
-        team_death_distribution,
-        weapons_kill_distribution,
-        weapons_death_distribution,
-        tot_kills,
-        tot_deaths,
-        tot_team_kills,
-        tot_team_deaths,
-        kpm,
-        dpm,
-    ) = distributions(game, player_id, total_time)
-
-    nemesis = dict(Counter(chain.from_iterable(death_distribution.values())))
-    victims = dict(Counter(chain.from_iterable(kill_distribution.values())))
-    weapons_kills = dict(
-        Counter(chain.from_iterable(weapons_kill_distribution.values()))
-    )
-    weapons_deaths = dict(
-        Counter(chain.from_iterable(weapons_death_distribution.values()))
-    )
 
+def _new_tally():
+    return {
+        "kill_distribution": defaultdict(list),
+        "death_distribution": defaultdict(list),
+        "team_kill_distribution": defaultdict(list),
+        "team_death_distribution": defaultdict(list),
+        "victims": Counter(),
+        "nemesis": Counter(),
+        "weapons_kills": Counter(),
+        "weapons_deaths": Counter(),
+        "tot_kills": 0,
+        "tot_deaths": 0,
+        "tot_team_kills": 0,
+        "tot_team_deaths": 0,
+    }
+
+
+def _tally_events(rows, start_time, wanted):
+    """
+    Single pass over (type, player1_id, player2_id, weapon, event_time) rows,
+    accumulating the kill/death tallies and connection times for every player
+    in `wanted` at once.
+    """
+    tallies = defaultdict(_new_tally)
+    timelimits = defaultdict(list)
+    seen = set()
+    for ev_type, p1, p2, weapon, event_time in rows:
+        seen.add(p1)
+        seen.add(p2)
+        if ev_type == "KILL":
+            offset = (event_time - start_time).total_seconds()
+            if p1 in wanted:
+                t = tallies[p1]
+                t["kill_distribution"][offset].append(p2)
+                t["victims"][p2] += 1
+                t["weapons_kills"][weapon] += 1
+                t["tot_kills"] += 1
+            if p2 in wanted and p2 != p1:
+                t = tallies[p2]
+                t["death_distribution"][offset].append(p1)
+                t["nemesis"][p1] += 1
+                t["weapons_deaths"][weapon] += 1
+                t["tot_deaths"] += 1
+        elif ev_type == "TEAM KILL":
+            offset = (event_time - start_time).total_seconds()
+            if p1 in wanted:
+                t = tallies[p1]
+                t["team_kill_distribution"][offset].append(p2)
+                t["tot_team_kills"] += 1
+            if p2 in wanted and p2 != p1:
+                t = tallies[p2]
+                t["team_death_distribution"][offset].append(p1)
+                t["tot_team_deaths"] += 1
+        elif ev_type in ("CONNECTED", "DISCONNECTED") and p1 in wanted:
+            timelimits[p1].append((event_time, ev_type))
+
+    return tallies, timelimits, seen
+
+
+def _stats_from_tally(player_id, total_time, t):
+    if total_time == 0:
+        kpm = 0
+        dpm = 0
+    else:
+        kpm = t["tot_kills"] / (total_time / 60)
+        dpm = t["tot_deaths"] / (total_time / 60)
     return {
         "player_id": player_id,
         "time_played_seconds": total_time,
         "kpm": kpm,
         "dpm": dpm,
-        "tot_kills": tot_kills,
-        "tot_deaths": tot_deaths,
-        "ratio": tot_kills / tot_deaths if tot_deaths != 0 else tot_kills,
-        "tot_team_kills": tot_team_kills,
-        "tot_team_deaths": tot_team_deaths,
-        "kill_distribution": kill_distribution,
-        "death_distribution": death_distribution,
-        "team_kill_distribution": team_kill_distribution,
-        "team_death_distribution": team_death_distribution,
-        "nemesis": nemesis,
-        "victims": victims,
-        "weapons_kills": weapons_kills,
-        "weapons_deaths": weapons_deaths,
+        "tot_kills": t["tot_kills"],
+        "tot_deaths": t["tot_deaths"],
+        "ratio": (
+            t["tot_kills"] / t["tot_deaths"] if t["tot_deaths"] != 0 else t["tot_kills"]
+        ),
+        "tot_team_kills": t["tot_team_kills"],
+        "tot_team_deaths": t["tot_team_deaths"],
+        "kill_distribution": t["kill_distribution"],
+        "death_distribution": t["death_distribution"],
+        "team_kill_distribution": t["team_kill_distribution"],
+        "team_death_distribution": t["team_death_distribution"],
+        "nemesis": dict(t["nemesis"]),
+        "victims": dict(t["victims"]),
+        "weapons_kills": dict(t["weapons_kills"]),
+        "weapons_deaths": dict(t["weapons_deaths"]),
     }
 
 
+def _player_stats_from_tally(game, player_id, tallies, timelimits, seen):
+    # no connection events: assume the whole game minus the 5 min warm-up
+    if player_id not in timelimits:
+        total_time = game.duration - 300
+        if player_id not in seen:
+            return empty_player_stats(player_id, total_time)
+    else:
+        total_time = connected_seconds(game, player_id, timelimits[player_id])
+        if total_time is None:
+            return None
+    return _stats_from_tally(player_id, total_time, tallies[player_id])
+
+
+def _stats_for_rows(game, rows, player_ids):
+    """
+    Stats for every player in `player_ids` from the game's
+    (type, player1_id, player2_id, weapon, event_time) rows.
+
+    When `player_stats_cache` in .env names a shelve file, entries are kept
+    there under "game_key:player_id" and recomputed once the game's start/end
+    time or duration, its event count or latest event time, or
+    STATS_CACHE_VERSION changes.
+    """
+    results = {}
+    cache = _get_stats_cache()
+    if cache is not None:
+        version = _events_version(game, (event_time for *_, event_time in rows))
+        for pid in player_ids:
+            hit = cache.get(f"{game.game_key}:{pid}")
+            if hit is not None and hit[0] == version:
+                results[pid] = hit[1]
+    wanted = {pid for pid in player_ids if pid not in results}
+    if not wanted:
+        return results
+
+    tallies, timelimits, seen = _tally_events(rows, game.start_time, wanted)
+
+    for pid in player_ids:
+        if pid in wanted:
+            results[pid] = _player_stats_from_tally(
+                game, pid, tallies, timelimits, seen
+            )
+
+    if cache is not None:
+        for pid in wanted:
+            cache[f"{game.game_key}:{pid}"] = (version, results[pid])
+    return results
+
+
+def calc_all_player_stats(session, game, player_ids):
+    """
+    Compute calc_player_stats for every player in `player_ids` from one
+    query over the game's events and a single pass over the rows.
+
+    Returns a dict of player_id -> stats dict (or None where the player's
+    connection times can't be paired), matching calc_player_stats per
+    player.
+    """
+    rows = session.execute(
+        select(
+            Event.type,
+            Event.player1_id,
+            Event.player2_id,
+            Event.weapon,
+            Event.event_time,
+        )
+        .where(Event.game_key == game.game_key)
+        .order_by(Event.event_id)
+    ).all()
+    return _stats_for_rows(game, rows, player_ids)
+
+
 # ----- Useful Queries for plotting
 
 
@@ -257,7 +346,11 @@ def get_games_player(
         filters.append(Game.start_time <= date_end)
     if player_id:
         filters.append(Game.players.any(Player.player_id == player_id))
-    games = session.query(Game).filter(*filters).all()
+    # eager-load events in one batched IN query so calc_player_stats
+    # doesn't trigger a lazy SELECT per game
+    games = (
+        session.query(Game).options(selectinload(Game.events)).filter(*filters).all()
+    )
 
     return games
 
@@ -300,6 +393,50 @@ def grab_player_plot_old(
     return metric_by_date
 
 
+def grab_players_plots(
+    session,
+    player_ids: List[str],
+    date_start: datetime,
+    date_end: datetime,
+    metric_columns,
+    round_to=2,
+):
+    """
+    Batched grab_player_plot_old: daily averages of every column in
+    `metric_columns` for all `player_ids`, in a single query.
+
+    Returns {player_id: {column key: {date: value}}}; players without any
+    analysed game in the range are left out.
+    """
+    day = func.date(Game.start_time)
+    results = (
+        session.query(
+            PlayerAnalysis.player_id,
+            day,
+            *(func.avg(column) for column in metric_columns),
+        )
+        .join(GameAnalysis, PlayerAnalysis.analysis_id == GameAnalysis.id)
+        .join(Game, GameAnalysis.game_key == Game.game_key)
+        .filter(
+            PlayerAnalysis.player_id.in_(player_ids),
+            Game.start_time >= date_start,
+            Game.start_time <= date_end,
+        )
+        .group_by(PlayerAnalysis.player_id, day)
+        .order_by(PlayerAnalysis.player_id, day)
+        .all()
+    )
+
+    plots = {}
+    for player_id, rows in itertools.groupby(results, key=lambda row: row[0]):
+        rows = list(rows)
+        plots[player_id] = {
+            column.key: {str(row[1]): round(row[i], round_to) for row in rows}
+            for i, column in enumerate(metric_columns, start=2)
+        }
+    return plots
+
+
 def fetch_player_metrics_by_game(
     session: Session,
     player_id: str,
@@ -310,6 +447,7 @@ def fetch_player_metrics_by_game(
     exclude_seeding: bool = True,
     extra_filters: Optional[List[ClauseElement]] = None,
     round_to: Optional[int] = None,
+    chunksize: int = 10_000,
 ) -> pd.DataFrame:
     """
     Fetches one row per game for the given player and metrics.
@@ -322,6 +460,7 @@ def fetch_player_metrics_by_game(
       exclude_seeding– if True, filters out Game.seeding == True
       extra_filters  – any additional SQLA filter() clauses you want to apply
       round_to       – if set, rounds all metric columns to this many decimals
+      chunksize      – rows fetched per round-trip while building the frame
 
     Returns:
       A DataFrame with:
@@ -358,15 +497,20 @@ def fetch_player_metrics_by_game(
         filt.extend(extra_filters)
     q = q.filter(*filt).order_by(Game.start_time)
 
-    # 4) execute and build DataFrame
-    rows = q.all()
-    if not rows:
+    # 4) stream the result set straight into DataFrame chunks
+    frames = list(
+        pd.read_sql(
+            q.statement,
+            session.connection(),
+            parse_dates=["timestamp"],
+            chunksize=chunksize,
+        )
+    )
+    if not frames:
         # return empty with correct columns
         return pd.DataFrame(columns=names).set_index("timestamp")
 
-    df = pd.DataFrame(rows, columns=names)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df = df.set_index("timestamp")
+    df = pd.concat(frames, ignore_index=True).set_index("timestamp")
 
     # 5) rounding if requested
     if round_to is not None:
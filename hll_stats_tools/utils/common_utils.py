@@ -4,15 +4,22 @@ from pathlib import Path
 
 from hll_stats_tools.utils.logger_utils import setup_logger
 
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    loads = json.loads
+
 logger = setup_logger(__name__)
 
 
 def openfile(file: str | Path) -> dict:
     if isinstance(file, str):
         file = Path(file)
-    with file.open("r", encoding="utf-8") as f:
+    with file.open("rb") as f:
         try:
-            data = json.loads(f.read())
+            data = loads(f.read())
         except Exception as e:
             logger.error("Failed to load JSON from %s: %s", file, str(e))
             data = None
@@ -37,9 +44,11 @@ def recuperate_date(date: str) -> datetime:
         The correctly formatted date string
     """
     # Split the string into two parts
-    splitted = date.split("T")
+    day, sep, clock = date.partition("T")
+    if not sep:
+        return None
     # Replace the last four characters with a colon
-    return f"{splitted[0]}T{splitted[1].replace('-', ':')}"
+    return f"{day}T{clock.replace('-', ':')}"
 
 
 def recuperate_datetime(date: str) -> datetime:
@@ -60,11 +69,11 @@ def recuperate_datetime(date: str) -> datetime:
         The correctly formatted date string
     """
     # Split the string into two parts
-    if "T" not in date:
+    day, sep, clock = date.partition("T")
+    if not sep:
         return None
-    splitted = date.split("T")
     # Replace the last four characters with a colon
-    isostring = f"{splitted[0]}T{splitted[1].replace('-', ':')}"
+    isostring = f"{day}T{clock.replace('-', ':')}"
     try:
         return datetime.fromisoformat(isostring)
     except Exception as e:
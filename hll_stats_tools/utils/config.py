@@ -0,0 +1,18 @@
+import functools
+from pathlib import Path
+
+import yaml
+
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:  # PyYAML built without libyaml; use the pure-Python loader
+    _Loader = yaml.SafeLoader
+
+
+@functools.lru_cache(maxsize=1)
+def load_config(path: str = "config.yaml") -> dict:
+    """
+    Parse config.yaml once per process; later calls return the same dict,
+    so callers must treat it as read-only.
+    """
+    return yaml.load(Path(path).read_text(), Loader=_Loader)
@@ -0,0 +1,15 @@
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+load_dotenv(".env")
+sql_database = os.getenv("sql_database")
+if not sql_database:
+    raise RuntimeError("sql_database not set in .env")
+
+# One pooled engine per process for the scripts; pre-ping drops dead
+# connections before they are handed out.
+ENGINE = create_engine(sql_database, echo=False, pool_pre_ping=True, pool_size=5)
+SessionLocal = sessionmaker(bind=ENGINE, expire_on_commit=False)
@@ -1,14 +1,25 @@
+import functools
 import logging
 import os
 from pathlib import Path
 
-import yaml
 from dotenv import load_dotenv
 
-cfg = yaml.safe_load(Path("config.yaml").read_text())
+from hll_stats_tools.utils.config import load_config
+
+cfg = load_config()
 to_console = cfg["to_console"]
 
 
+@functools.lru_cache(maxsize=1)
+def _log_file() -> Path:
+    # .env lookup and log directory creation, done once per process
+    load_dotenv(".env")
+    log_file = Path(os.getenv("log_file"))
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    return log_file
+
+
 def setup_logger(
     name: str = "hll_logger", level: int = logging.INFO, to_console: bool = True
 ) -> logging.Logger:
@@ -26,10 +37,7 @@ def setup_logger(
     )
 
     # Ensure log directory exists
-    load_dotenv(".env")
-    log_file = Path(os.getenv("log_file"))
-    # log_file = Path(log_file)
-    log_file.parent.mkdir(parents=True, exist_ok=True)
+    log_file = _log_file()
 
     # File handler
     fh = logging.FileHandler(log_file, encoding="utf-8")
@@ -57,8 +65,15 @@ def log_debug(logger, message, *args, maxlen=1000):
         maxlen (int): Max length for any individual argument;
         longer ones will be truncated.
     """
-    if logger.isEnabledFor(logging.DEBUG):
-        truncated_args = [
-            (str(a)[:maxlen] + "..." if len(str(a)) > maxlen else a) for a in args
-        ]
-        logger.debug(message, *truncated_args)
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if not args:
+        logger.debug(message)
+        return
+
+    truncated_args = []
+    for a in args:
+        # convert once; short args are passed through untouched
+        s = a if isinstance(a, str) else str(a)
+        truncated_args.append(s[:maxlen] + "..." if len(s) > maxlen else a)
+    logger.debug(message, *truncated_args)
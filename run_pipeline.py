@@ -1,12 +1,9 @@
-from pathlib import Path
-
-import yaml
-
 from hll_stats_tools.data_acquisition.data_pipeline import run_data_pipeline
 from hll_stats_tools.legacy_json.json_pipeline import run_json_pipeline
 from hll_stats_tools.sql_pipeline.ingest_events import run_sql_pipeline
+from hll_stats_tools.utils.config import load_config
 
-cfg = yaml.safe_load(Path("config.yaml").read_text())
+cfg = load_config()
 
 
 data_acquisition = cfg["run_data_pipeline"]
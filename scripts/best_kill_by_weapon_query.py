@@ -1,17 +1,18 @@
 import json
-import os
 from collections import namedtuple
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import false, func, literal, or_, select
 
-from hll_stats_tools.sql_pipeline.models import PlayerAnalysis
+from hll_stats_tools.sql_pipeline.models import (
+    Game,
+    GameAnalysis,
+    Player,
+    PlayerAnalysis,
+)
+from hll_stats_tools.utils.common_utils import openfile
+from hll_stats_tools.utils.db import SessionLocal
 
-load_dotenv(".env")
-sql_database = os.getenv("sql_database")
-
-data = json.load(open("event_weapons.json"))
+data = openfile("event_weapons.json")
 
 # weapon_groups = {
 #     "mines": [
@@ -44,9 +45,7 @@ data = json.load(open("event_weapons.json"))
 # }
 
 weapons_of_interest = [
-    key
-    for key, values in data.items()
-    if values["common_name"] == "grease_gun"
+    key for key, values in data.items() if values["common_name"] == "grease_gun"
 ]
 # weapons_of_interest = [
 #     key for key, values in data.items() if values["group"] == "automatic"
@@ -56,47 +55,55 @@ weapon_group_name = "grease_gun"
 # weapons_of_interest = weapon_groups[weapon_group_name]
 # weapons_of_interest = ["BOMBING RUN"]
 
-# --- Set up the database connection ---
-engine = create_engine(sql_database, echo=False)
-Session = sessionmaker(bind=engine)
-session = Session()
-
 # ————— Data Structures —————
-KillEntry = namedtuple("KillEntry", ["player", "game", "count"])
-entries: list[KillEntry] = []
+KillEntry = namedtuple("KillEntry", ["player_name", "map", "start_time", "count"])
 
-# ————— Collect Counts —————
-for pa in session.scalars(select(PlayerAnalysis)).all():
-    raw = pa.weapons_kill_distribution
-    if not raw:
-        continue
-    try:
-        dist = json.loads(raw)
-    except json.JSONDecodeError:
-        continue
-    # Sum only the weapons you care about:
-    count = sum(dist.get(w, 0) for w in weapons_of_interest)
-    if count == 0:
-        continue
 
-    # Navigate relationships
-    player = pa.player  # Player instance
-    ga = pa.analysis  # GameAnalysis instance
-    if not ga or not ga.game:
-        continue
-    game = ga.game  # Game instance
+def weapon_kills(weapon):
+    # quote the JSON key: weapon names contain spaces
+    return func.coalesce(
+        func.json_extract(PlayerAnalysis.weapons_kill_distribution, f'$."{weapon}"'),
+        0,
+    )
 
-    entries.append(KillEntry(player=player, game=game, count=count))
 
-# ————— Sort & Show Top 10 —————
-top_10 = sorted(entries, key=lambda e: e.count, reverse=True)[:10]
+# ————— Sum, Sort & Keep Top 10 in SQL —————
+# LIMIT 10 bounds the rows fetched.
+# Sum only the weapons you care about:
+# (each distinct weapon once, in a fixed order so the statement text is stable)
+weapons_set = frozenset(weapons_of_interest)
+count = sum((weapon_kills(w) for w in sorted(weapons_set)), literal(0)).label("count")
+stmt = (
+    # plain Core columns: no ORM instances to hydrate or relationships to load
+    select(Player.current_name, Game.map, Game.start_time, count)
+    .select_from(PlayerAnalysis)
+    .join(PlayerAnalysis.analysis)
+    .join(GameAnalysis.game)
+    .join(PlayerAnalysis.player)
+    # cheap substring prefilter: only rows whose raw JSON names one of the
+    # weapons (as json.dumps wrote the key) reach the JSON functions below
+    .where(
+        or_(
+            false(),
+            *(
+                PlayerAnalysis.weapons_kill_distribution.contains(
+                    json.dumps(w), autoescape=True
+                )
+                for w in sorted(weapons_set)
+            ),
+        )
+    )
+    # skips empty and malformed distributions, which json_extract rejects
+    .where(func.json_valid(PlayerAnalysis.weapons_kill_distribution))
+    .where(count > 0)
+    .order_by(count.desc(), PlayerAnalysis.id)
+    .limit(10)
+)
+with SessionLocal() as session:
+    top_10 = [KillEntry(*row) for row in session.execute(stmt)]
 
 for rank, entry in enumerate(top_10, start=1):
-    p = entry.player
-    g = entry.game
     print(
-        f"{rank}. {p.current_name} — {entry.count} kills with “{weapon_group_name}” "
-        f"on map {g.map} at {g.start_time}"
+        f"{rank}. {entry.player_name} — {entry.count} kills "
+        f"with “{weapon_group_name}” on map {entry.map} at {entry.start_time}"
     )
-
-session.close()
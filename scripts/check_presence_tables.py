@@ -1,19 +1,17 @@
-import os
+from sqlalchemy import MetaData
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect
+from hll_stats_tools.utils.db import ENGINE
 
-load_dotenv()
-engine = create_engine(os.getenv("sql_database"))
-inspector = inspect(engine)
+# reflect the whole schema in one pass instead of a query per table
+metadata = MetaData()
+metadata.reflect(bind=ENGINE)
 
-tables = inspector.get_table_names()
-# print("Tables in DB:", tables)
-for table_name in tables:
+tables = metadata.tables
+# print("Tables in DB:", list(tables))
+for table_name in sorted(tables):
     print(f"\n📘 Table: {table_name}")
-    columns = inspector.get_columns(table_name)
-    for col in columns:
-        print(f"  - {col['name']} ({col['type']})")
+    for col in tables[table_name].columns:
+        print(f"  - {col.name} ({col.type})")
 
 assert "game_analyses" in tables
 assert "player_analyses" in tables
@@ -1,56 +1,82 @@
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+import matplotlib
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
 from hll_stats_tools.plotting.make_plot import plot_multiple_metrics
 from hll_stats_tools.sql_pipeline.models import (
     PlayerAnalysis,
 )
-from hll_stats_tools.sql_pipeline.sql_utils import grab_player_plot
+from hll_stats_tools.sql_pipeline.sql_utils import grab_players_plots
+from hll_stats_tools.utils.db import SessionLocal
 
 load_dotenv(".env")
-sql_database = os.getenv("sql_database")
 ESPTjson = os.getenv("group_members_json")
 ESPT = json.load(open(ESPTjson))
 out_png_folder = os.getenv("group_png_folder")
 plot_type = "scatter"  # or "date_average" or "both"
 
+# plots are only ever saved to file; workers must not open a GUI backend
+matplotlib.use("Agg")
+
+
+def _render_one(task):
+    # runs in a worker process; one figure per call
+    file_out_name, title, kpm, dpm = task
+    plot_multiple_metrics(
+        {"KPM": kpm, "DPM": dpm},
+        title=title,
+        group_by="W",
+        namefile=file_out_name,
+        rolling_average=7,
+        display_rolling_average_overlay=True,
+    )
+
 
 def main():
-    db_url = os.getenv("sql_database")
-    if not db_url:
-        raise RuntimeError("sql_database not set in .env")
-    engine = create_engine(db_url, echo=False)
-    Session = sessionmaker(bind=engine)
-    with Session() as session:
+    start = datetime(2024, 1, 1)
+    end = datetime.now()
+    tasks = []
+    with SessionLocal() as session:
+        metrics = {}
+        if plot_type == "date_average" or plot_type == "both":
+            # one query for every member's daily KPM/DPM instead of two each
+            metrics = grab_players_plots(
+                session,
+                list(ESPT),
+                start,
+                end,
+                [PlayerAnalysis.kpm, PlayerAnalysis.dpm],
+            )
         for id, names in ESPT.items():
             name = names[0]
             today = datetime.today().strftime("%Y-%m-%d")
             file_out_name = f"{today}_{name}_kpm_dpm.png"
             file_out_name = Path(out_png_folder) / file_out_name
 
-            start = datetime(2024, 1, 1)
-            end = datetime.now()
             title = f"{name} KPM & DPM"
             print(f">>>plotting {name} in {file_out_name}")
 
             if plot_type == "date_average" or plot_type == "both":
-                kpm = grab_player_plot(session, id, start, end, PlayerAnalysis.kpm)
-                dpm = grab_player_plot(session, id, start, end, PlayerAnalysis.dpm)
-                plot_multiple_metrics(
-                    {"KPM": kpm, "DPM": dpm},
-                    title=title,
-                    group_by="W",
-                    namefile=file_out_name,
-                    rolling_average=7,
-                    display_rolling_average_overlay=True,
+                player_metrics = metrics.get(id, {})
+                tasks.append(
+                    (
+                        file_out_name,
+                        title,
+                        player_metrics.get("kpm", {}),
+                        player_metrics.get("dpm", {}),
+                    )
                 )
 
+    # rendering is CPU-bound and independent per player
+    if tasks:
+        with ProcessPoolExecutor() as executor:
+            list(executor.map(_render_one, tasks))
+
 
 if __name__ == "__main__":
     main()
@@ -1,69 +1,83 @@
-import os
+import argparse
 import time
 from datetime import datetime
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, distinct, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, func, select
 
 from hll_stats_tools.sql_pipeline.models import Event
+from hll_stats_tools.utils.db import SessionLocal
 
-# Load env vars
-load_dotenv(".env")
-sql_database = os.getenv("sql_database")
 
-
-def main():
-    engine = create_engine(sql_database, echo=False)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-
-    player_id = "steam_id"  # replace with the Steam ID you want
-    start = datetime(2025, 1, 1, 0, 0, 0)
-    end = datetime(2025, 2, 1, 0, 0, 0)  # up to but not including Feb 1st
-
-    start_time = time.perf_counter()
-    kill_count = (
-        session.query(func.count(Event.event_id))
-        .filter(
+def _kill_count(player_column):
+    # one KILL count over the bound player and [start, end) window
+    return (
+        select(func.count())
+        .where(
             Event.type == "KILL",
-            Event.player1_id == player_id,
-            Event.event_time >= start,
-            Event.event_time < end,
+            player_column == bindparam("player_id"),
+            Event.event_time >= bindparam("start"),
+            Event.event_time < bindparam("end"),
         )
-        .scalar()
-    )
-    death_count = (
-        session.query(func.count(Event.event_id))
-        .filter(
-            Event.type == "KILL",
-            Event.player2_id == player_id,
-            Event.event_time >= start,
-            Event.event_time < end,
-        )
-        .scalar()
+        .scalar_subquery()
     )
 
-    end_time = time.perf_counter()
 
-    # 1. Get all event types
-    rows = session.query(distinct(Event.type)).order_by(Event.type).all()
+# Kills and deaths as two scalar COUNT subqueries in one statement: each count
+# seeks its own (type, playerN_id, event_time) index. Built once with
+# bound parameters, so the SQL text is identical on every execution and both
+# SQLAlchemy's compiled cache and the driver's statement cache are reused.
+KILLS_AND_DEATHS = select(
+    _kill_count(Event.player1_id).label("kills"),
+    _kill_count(Event.player2_id).label("deaths"),
+)
+
 
-    # 2. rows will be a list of 1‐tuples, e.g. [('DEATH',), ('JOIN',), ('KILL',), …]
-    #    so unpack them for printing:
-    types = [r[0] for r in rows]
+def main(player_id: str, start: datetime, end: datetime):
+    """Print the event types and `player_id`'s kills/deaths in [start, end)."""
+    with SessionLocal() as session:
+        start_time = time.perf_counter()
+        kill_count, death_count = session.execute(
+            KILLS_AND_DEATHS, {"player_id": player_id, "start": start, "end": end}
+        ).one()
 
-    print("All event types:", types)
+        end_time = time.perf_counter()
 
-    print(f"Time taken: {end_time - start_time}")
+        # 1. Get all event types as a flat list (served from idx_events_type)
+        types = session.scalars(
+            select(Event.type).distinct().order_by(Event.type)
+        ).all()
 
-    print(
-        f"Player {player_id} scored {kill_count} "
-        f"kills and died {death_count} times in {start.month} {start.year}"
+        print("All event types:", types)
+
+        print(f"Time taken: {end_time - start_time}")
+
+        print(
+            f"Player {player_id} scored {kill_count} "
+            f"kills and died {death_count} times "
+            f"between {start} and {end}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Count a player's kills and deaths in a date range."
+    )
+    parser.add_argument("--player-id", required=True, help="Steam ID of the player")
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=datetime(2025, 1, 1),
+        help="ISO date/time, inclusive (default: 2025-01-01)",
+    )
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=datetime(2025, 2, 1),
+        help="ISO date/time, exclusive (default: 2025-02-01)",
     )
-    # 4) Clean up
-    session.close()
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.player_id, args.start, args.end)